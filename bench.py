@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for bot.py's DB helpers and text renderers.
+
+A database of the requested size is generated first (bulk inserts), then
+each benchmark is timed over several rounds. Results are printed and can be
+saved as JSON; --compare prints the ratio against an earlier run and flags
+regressions, so two commits can be compared on the same machine.
+
+Run (throwaway SQLite file unless DB_PATH / DB_BACKEND is set):
+  python bench.py                                   # default sizes
+  python bench.py --users 100000 --codes 500000 --history 1000000
+  python bench.py --json bench-new.json --compare bench-old.json
+  python bench.py --only ensure_user,uget,F         # subset
+
+Exit status is 1 if --compare finds a benchmark slower than --threshold.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+os.environ.setdefault("BOT_TOKEN", "123456:BENCH")
+os.environ.setdefault("QUERY_PROFILE", "0")
+if "DB_PATH" not in os.environ and os.getenv("DB_BACKEND", "sqlite") == "sqlite":
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="shopbot-bench-"), "bench.db")
+
+from telegram import User  # noqa: E402
+
+import bot  # noqa: E402
+
+USER_BASE = 20_000_000
+
+# -------------------- DATASET --------------------
+
+def generate(users: int, codes: int, history: int, products: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    ts = bot.now_ts()
+    bot.init_db()
+    with bot.db() as c:
+        c.executemany(
+            "INSERT INTO products(key,name,price,cat) VALUES(?,?,?,?) ON CONFLICT(key) DO NOTHING",
+            [(f"uc{i}", f"{60 * (i + 1)} UC", 80 * (i + 1), "UC") for i in range(products)]
+            + [(f"dm{i}", f"{100 * (i + 1)} Diamond", 90 * (i + 1), "DM") for i in range(products)],
+        )
+        c.executemany(
+            "INSERT INTO dm_stock(pkey,qty) VALUES(?,?) ON CONFLICT(pkey) DO NOTHING",
+            [(f"dm{i}", rng.randrange(0, 500)) for i in range(products)],
+        )
+        c.executemany(
+            "INSERT INTO users(user_id,name,created_ts,last_active_ts,balance,total_purchase) VALUES(?,?,?,?,?,?) ON CONFLICT(user_id) DO NOTHING",
+            [(USER_BASE + i, f"User {i}", ts, ts, rng.randrange(0, 5000), rng.randrange(0, 20000)) for i in range(users)],
+        )
+        # every product gets codes, a share already used; "ucpop" is reserved for pop_one_code
+        c.executemany(
+            "INSERT INTO codes(pkey,code,used) VALUES(?,?,?)",
+            [(f"uc{i % products}", f"B{i:09d}{rng.randrange(16**6):06x}", 1 if rng.random() < 0.5 else 0) for i in range(codes)],
+        )
+        c.executemany(
+            "INSERT INTO history(user_id,type,text,ts) VALUES(?,?,?,?)",
+            [(USER_BASE + rng.randrange(max(1, users)), rng.choice(("code", "payment", "purchase")), f"bench entry {i}", ts - rng.randrange(86400)) for i in range(history)],
+        )
+    return {"users": users, "codes": codes, "history": history, "products": products}
+
+# -------------------- RUNNER --------------------
+
+def timeit(fn: Callable[[], object], number: int, rounds: int) -> dict:
+    fn()  # warm-up (statement cache, page cache)
+    per_call: List[float] = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number)
+    best = min(per_call)
+    return {
+        "number": number,
+        "rounds": rounds,
+        "best_us": round(best * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "ops_per_s": round(1 / best, 1) if best else 0.0,
+    }
+
+def oneshot(fn: Callable[[int], object], rounds: int) -> dict:
+    # for calls that change the dataset (bulk inserts): a fresh argument each round
+    per_call = []
+    for r in range(rounds):
+        t0 = time.perf_counter()
+        fn(r)
+        per_call.append(time.perf_counter() - t0)
+    best = min(per_call)
+    return {"number": 1, "rounds": rounds, "best_us": round(best * 1e6, 3), "median_us": round(statistics.median(per_call) * 1e6, 3), "ops_per_s": round(1 / best, 3) if best else 0.0}
+
+def benchmarks(size: dict, number: int, add_sizes: List[int]) -> Dict[str, Callable[[], dict]]:
+    rng = random.Random(7)
+    users = max(1, size["users"])
+    pick = lambda: USER_BASE + rng.randrange(users)  # noqa: E731
+    tg_users = [User(USER_BASE + i, f"User {i}", False) for i in range(min(users, 1000))]
+    uc = bot.get_products("UC")
+    dm = bot.get_products("DM")
+    acct = bot.uget(USER_BASE)
+
+    def pop_setup() -> None:
+        bot.add_codes("ucpop", [f"P{i:09d}" for i in range(number * 6 + 10)])
+
+    b: Dict[str, Callable[[], dict]] = {
+        "ensure_user": lambda: timeit(lambda: bot.ensure_user(rng.choice(tg_users)), number, 5),
+        "uget": lambda: timeit(lambda: bot.uget(pick()), number, 5),
+        "sget": lambda: timeit(lambda: bot.sget("notifications", "ON"), number, 5),
+        "get_uc_stock": lambda: timeit(lambda: bot.get_uc_stock(f"uc{rng.randrange(size['products'])}"), number, 5),
+        "uc_stock_map": lambda: timeit(bot.uc_stock_map, max(1, number // 10), 5),
+        "get_products": lambda: timeit(lambda: bot.get_products("UC"), number, 5),
+        "pop_one_code": lambda: (pop_setup(), timeit(lambda: bot.pop_one_code("ucpop", pick()), number, 5))[1],
+        "history_page": lambda: timeit(lambda: bot.history_page(pick(), "code"), number, 5),
+        "F": lambda: timeit(lambda: bot.F("Confirm to buy 1 code. Balance will be deducted only after confirm."), number * 10, 5),
+        "mono": lambda: timeit(lambda: bot.mono("ORD-1234567890<&>"), number * 10, 5),
+        "render_unipin_list": lambda: timeit(lambda: bot.render_unipin_list(uc, {p["key"]: 7 for p in uc}), number, 5),
+        "render_diamond_list": lambda: timeit(lambda: bot.render_diamond_list(dm, {p["key"]: 7 for p in dm}), number, 5),
+        "render_account": lambda: timeit(lambda: bot.render_account(acct), number, 5),
+    }
+    for n in add_sizes:
+        b[f"add_codes_{n}"] = (lambda n=n: oneshot(lambda r: bot.add_codes(f"bulk{n}_{r}_{time.time_ns()}", [f"A{r}-{i:09d}" for i in range(n)]), 3))
+    return b
+
+def git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+def compare(results: Dict[str, dict], size: dict, old_path: str, threshold: float) -> bool:
+    with open(old_path, encoding="utf-8") as f:
+        data = json.load(f)
+    old = data["results"]
+    if data.get("meta", {}).get("size") != size:
+        print(f"warning: dataset size differs from {old_path}: {data.get('meta', {}).get('size')}")
+    regressed = False
+    print(f"\ncompare with {old_path} (ratio new/old of best_us, >{threshold:.2f} = regression)")
+    for name, r in results.items():
+        o = old.get(name)
+        if not o or not o.get("best_us"):
+            continue
+        ratio = r["best_us"] / o["best_us"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{name:24} {o['best_us']:>12.1f} -> {r['best_us']:>12.1f} us  x{ratio:.2f} {flag}")
+    return regressed
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="DB helper / renderer micro-benchmarks for the shop bot.")
+    ap.add_argument("--users", type=int, default=10_000)
+    ap.add_argument("--codes", type=int, default=100_000)
+    ap.add_argument("--history", type=int, default=100_000)
+    ap.add_argument("--products", type=int, default=12)
+    ap.add_argument("--number", type=int, default=500, help="calls per timing round")
+    ap.add_argument("--add-codes", default="10000,100000", help="add_codes batch sizes")
+    ap.add_argument("--only", help="comma-separated benchmark names")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", help="earlier --json file to compare against")
+    ap.add_argument("--threshold", type=float, default=1.25, help="regression ratio for --compare")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    size = generate(args.users, args.codes, args.history, args.products, args.seed)
+    print(f"db={bot.DB_BACKEND}:{bot.DATABASE_URL if bot.IS_PG else bot.DB_PATH} {size} generated in {time.perf_counter() - t0:.1f}s", flush=True)
+
+    add_sizes = [int(x) for x in args.add_codes.split(",") if x.strip()]
+    todo = benchmarks(size, args.number, add_sizes)
+    if args.only:
+        names = [x.strip() for x in args.only.split(",") if x.strip()]
+        unknown = [x for x in names if x not in todo]
+        if unknown:
+            ap.error(f"unknown benchmark(s): {', '.join(unknown)}; available: {', '.join(todo)}")
+        todo = {k: todo[k] for k in names}
+
+    results: Dict[str, dict] = {}
+    for name, run in todo.items():
+        results[name] = r = run()
+        print(f"{name:24} best {r['best_us']:>12.1f} us  median {r['median_us']:>12.1f} us  {r['ops_per_s']:>12} ops/s", flush=True)
+
+    if args.json:
+        meta = {
+            "git": git_rev(),
+            "ts": bot.now_ts(),
+            "python": platform.python_version(),
+            "sqlite": bot.sqlite3.sqlite_version,
+            "backend": bot.DB_BACKEND,
+            "machine": platform.machine(),
+            "size": size,
+            "number": args.number,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    if args.compare and compare(results, size, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
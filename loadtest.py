@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Offline load test for bot.py - no network, no real Telegram.
+
+The bot runs in-process with an in-memory stand-in for the Bot API: every
+outbound call is recorded and answered with a canned result after a
+simulated latency, and a configurable share of calls get a 429 RetryAfter.
+Synthetic users are driven through scripted scenarios by feeding updates
+straight into Application.process_update.
+
+Scenarios:
+  start      /start -> Verify
+  unipin     Unipin list -> package -> Confirm Buy
+  diamond    Diamond list -> package -> UID -> Confirm Order -> admin Approve
+  addmoney   Add Money -> amount -> method -> Next -> TxID -> screenshot photo
+  broadcast  admin Send All Msg to every user
+
+Run (uses a throwaway SQLite file unless DB_PATH / DB_BACKEND is set):
+  python loadtest.py --users 1000 --concurrency 100
+  python loadtest.py --scenarios unipin,diamond --api-latency-ms 50 --retry-after-rate 0.01
+  python loadtest.py --json loadtest.json     # machine-readable results for CI
+
+Exit status is 1 if any handler raised something other than RetryAfter.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import tempfile
+import contextvars
+from typing import Optional, List, Dict, Tuple
+
+os.environ.setdefault("BOT_TOKEN", "123456:LOADTEST")
+os.environ.setdefault("ADMIN_IDS", "1")
+os.environ.setdefault("QUERY_PROFILE", "0")
+os.environ.setdefault("METRICS_PORT", "0")
+if "DB_PATH" not in os.environ and os.getenv("DB_BACKEND", "sqlite") == "sqlite":
+    os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="shopbot-load-"), "load.db")
+
+from telegram import Update, User  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+import bot  # noqa: E402
+
+ADMIN_ID = sorted(bot.ADMIN_IDS)[0]
+BOT_ID = int(bot.BOT_TOKEN.split(":", 1)[0]) if bot.BOT_TOKEN.split(":", 1)[0].isdigit() else 123456
+USER_BASE = 10_000_000
+
+UC_NAME = "80 UC"
+DM_NAME = "115 Diamond"
+METHOD = "bKash"
+
+# name of the scenario the current task is running (None = harness bookkeeping)
+_scenario: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("scenario", default=None)
+
+# -------------------- FAKE BOT API --------------------
+
+class FakeBotAPI(BaseRequest):
+    """In-process Bot API: records calls, sleeps, answers with canned results."""
+
+    def __init__(self, latency_ms: float = 20.0, retry_after_rate: float = 0.0, seed: int = 1) -> None:
+        self.latency = latency_ms / 1000.0
+        self.retry_after_rate = retry_after_rate
+        self.rng = random.Random(seed)
+        self.calls: Dict[Tuple[Optional[str], str], int] = {}
+        self.retry_after: Dict[Optional[str], int] = {}
+        self._msg_id = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _message(self, chat_id, p: dict) -> dict:
+        self._msg_id += 1
+        m = {"message_id": self._msg_id, "date": int(time.time()), "chat": {"id": int(chat_id or 0), "type": "private"}}
+        if "text" in p:
+            m["text"] = p["text"]
+        if "caption" in p:
+            m["caption"] = p["caption"]
+        if "photo" in p:
+            m["photo"] = [{"file_id": str(p["photo"]), "file_unique_id": "u", "width": 90, "height": 90}]
+        return m
+
+    async def do_request(self, url: str, method: str, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None) -> Tuple[int, bytes]:
+        api = url.rsplit("/", 1)[-1]
+        scn = _scenario.get()
+        self.calls[(scn, api)] = self.calls.get((scn, api), 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+        if api != "getMe" and self.rng.random() < self.retry_after_rate:
+            self.retry_after[scn] = self.retry_after.get(scn, 0) + 1
+            body = {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1", "parameters": {"retry_after": 1}}
+            return 429, json.dumps(body).encode()
+        p = request_data.parameters if request_data is not None else {}
+        if api == "getMe":
+            result = {"id": BOT_ID, "is_bot": True, "first_name": "LoadTest", "username": "loadtest_bot",
+                      "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        elif api == "getChatMember":
+            result = {"status": "member", "user": {"id": int(p.get("user_id", 0)), "is_bot": False, "first_name": "u"}}
+        elif api in ("sendMessage", "sendPhoto", "editMessageText", "editMessageReplyMarkup", "sendDocument"):
+            result = self._message(p.get("chat_id"), p)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+# -------------------- SYNTHETIC UPDATES --------------------
+
+class Sim:
+    def __init__(self, app, api: FakeBotAPI) -> None:
+        self.app = app
+        self.api = api
+        self._update_id = 0
+        self.latencies: Dict[str, List[float]] = {}
+        self.db_ops: Dict[str, int] = {}
+
+    def _user(self, uid: int) -> dict:
+        return {"id": uid, "is_bot": False, "first_name": f"User{uid}"}
+
+    def _msg(self, uid: int, **extra) -> dict:
+        self._update_id += 1
+        m = {"message_id": self._update_id, "date": int(time.time()), "chat": {"id": uid, "type": "private"}, "from": self._user(uid)}
+        m.update(extra)
+        return m
+
+    async def _feed(self, payload: dict) -> None:
+        self._update_id += 1
+        payload["update_id"] = self._update_id
+        upd = Update.de_json(payload, self.app.bot)
+        t0 = time.perf_counter()
+        await self.app.process_update(upd)
+        self.latencies.setdefault(_scenario.get(), []).append(time.perf_counter() - t0)
+
+    async def text(self, uid: int, text: str) -> None:
+        await self._feed({"message": self._msg(uid, text=text)})
+
+    async def command(self, uid: int, cmd: str) -> None:
+        text = "/" + cmd
+        await self._feed({"message": self._msg(uid, text=text, entities=[{"type": "bot_command", "offset": 0, "length": len(text)}])})
+
+    async def photo(self, uid: int) -> None:
+        photo = [{"file_id": f"photo-{uid}", "file_unique_id": f"p{uid}", "width": 640, "height": 480}]
+        await self._feed({"message": self._msg(uid, photo=photo)})
+
+    async def callback(self, uid: int, data: str) -> None:
+        self._update_id += 1
+        msg = {"message_id": self._update_id, "date": int(time.time()), "chat": {"id": uid, "type": "private"}, "text": "…"}
+        await self._feed({"callback_query": {"id": str(self._update_id), "from": self._user(uid), "chat_instance": "load", "data": data, "message": msg}})
+
+    def on_query(self, sql: str, params, seconds: float) -> None:
+        scn = _scenario.get()
+        if scn is not None:
+            self.db_ops[scn] = self.db_ops.get(scn, 0) + 1
+
+# -------------------- SCENARIOS --------------------
+
+async def scn_start(sim: Sim, uid: int) -> None:
+    await sim.command(uid, "start")
+    await sim.text(uid, "✅ Verify")
+
+async def scn_unipin(sim: Sim, uid: int) -> None:
+    await sim.text(uid, "🎫 Unipin")
+    await sim.text(uid, f"🎫 {UC_NAME}")
+    await sim.text(uid, "✅ Confirm Buy")
+
+async def scn_diamond(sim: Sim, uid: int) -> None:
+    await sim.text(uid, "💎 Diamond")
+    await sim.text(uid, f"💎 {DM_NAME}")
+    await sim.text(uid, str(1000000000 + uid % 1000000000))
+    await sim.text(uid, "✅ Confirm Order")
+    tok = _scenario.set(None)
+    try:
+        with bot.db() as c:
+            r = c.execute("SELECT order_id FROM orders WHERE user_id=? AND status=? ORDER BY created_ts DESC", (uid, "PENDING")).fetchone()
+    finally:
+        _scenario.reset(tok)
+    if r:
+        await sim.callback(ADMIN_ID, f"dm_app|{r['order_id']}")
+
+async def scn_addmoney(sim: Sim, uid: int) -> None:
+    await sim.text(uid, "➕ Add Money")
+    await sim.text(uid, "500")
+    await sim.text(uid, f"💳 {METHOD}")
+    await sim.text(uid, "➡ Next")
+    await sim.text(uid, f"TX{uid}-{time.time_ns()}")  # TxIDs are unique per method
+    await sim.photo(uid)
+
+async def scn_broadcast(sim: Sim, uid: int) -> None:
+    await sim.text(ADMIN_ID, "📣 Send All Msg")
+    await sim.text(ADMIN_ID, "Load test broadcast")
+
+SCENARIOS = {
+    "start": scn_start,
+    "unipin": scn_unipin,
+    "diamond": scn_diamond,
+    "addmoney": scn_addmoney,
+    "broadcast": scn_broadcast,
+}
+
+# -------------------- RUNNER --------------------
+
+def seed(users: int) -> List[int]:
+    # products, stock, a payment method and funded users, in bulk
+    bot.add_product("uc80", UC_NAME, 80, "UC")
+    bot.add_product("dm115", DM_NAME, 100, "DM")
+    bot.add_codes("uc80", [f"LOAD-{i:07d}-{random.randrange(16**8):08x}" for i in range(users)])
+    bot.set_dm_stock("dm115", users * 2)
+    ts = bot.now_ts()
+    ids = [USER_BASE + i for i in range(users)]
+    with bot.db() as c:
+        c.execute("INSERT INTO payment_methods(name,details) VALUES(?,?) ON CONFLICT(name) DO UPDATE SET details=excluded.details", (METHOD, "01700000000 (send money)"))
+        c.executemany(
+            "INSERT INTO users(user_id,name,created_ts,last_active_ts,balance) VALUES(?,?,?,?,?) ON CONFLICT(user_id) DO UPDATE SET balance=excluded.balance",
+            [(uid, f"User{uid}", ts, ts, 100_000) for uid in ids],
+        )
+    return ids
+
+def pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p * (len(xs) - 1))))]
+
+def handler_errors() -> Dict[str, float]:
+    with bot.ERRORS.lock:
+        return {dict(k).get("exc", "?"): v for k, v in bot.ERRORS.values.items()}
+
+async def run_phase(sim: Sim, name: str, ids: List[int], concurrency: int) -> dict:
+    fn = SCENARIOS[name]
+    sem = asyncio.Semaphore(concurrency)
+    runs: List[float] = []
+    errs0 = handler_errors()
+
+    async def one(uid: int) -> None:
+        async with sem:
+            _scenario.set(name)
+            t0 = time.perf_counter()
+            await fn(sim, uid)
+            runs.append(time.perf_counter() - t0)
+
+    bg0 = sum(n for (scn, _), n in sim.api.calls.items() if scn is None)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(asyncio.create_task(one(uid)) for uid in ids))
+    # messages queued in the outbox count towards the phase until delivered
+    while bot.outbox_pending() and time.perf_counter() - t0 < 120:
+        await asyncio.sleep(0.05)
+    wall = time.perf_counter() - t0
+    errs = {k: int(v - errs0.get(k, 0)) for k, v in handler_errors().items() if v - errs0.get(k, 0) > 0}
+    lat = sim.latencies.get(name, [])
+    api_calls = sum(n for (scn, _), n in sim.api.calls.items() if scn == name)
+    api_calls += sum(n for (scn, _), n in sim.api.calls.items() if scn is None) - bg0
+    return {
+        "scenario": name,
+        "runs": len(runs),
+        "updates": len(lat),
+        "wall_s": round(wall, 3),
+        "runs_per_s": round(len(runs) / wall, 2) if wall else 0.0,
+        "updates_per_s": round(len(lat) / wall, 2) if wall else 0.0,
+        "update_p50_ms": round(pct(lat, 0.50) * 1000, 2),
+        "update_p99_ms": round(pct(lat, 0.99) * 1000, 2),
+        "run_p50_ms": round(pct(runs, 0.50) * 1000, 2),
+        "run_p99_ms": round(pct(runs, 0.99) * 1000, 2),
+        "db_ops_per_run": round(sim.db_ops.get(name, 0) / max(1, len(runs)), 1),
+        "api_calls_per_run": round(api_calls / max(1, len(runs)), 1),
+        "retry_after": sim.api.retry_after.get(name, 0),
+        "errors": errs,
+    }
+
+async def run(args) -> List[dict]:
+    bot.init_db()
+    bot.rebuild_referral_stats()
+    ids = seed(args.users)
+    api = FakeBotAPI(latency_ms=args.api_latency_ms, retry_after_rate=args.retry_after_rate, seed=args.seed)
+    app = bot.build_app(request=api)
+    sim = Sim(app, api)
+    bot.QUERY_HOOKS.append(sim.on_query)
+    await app.initialize()
+    await bot.post_init(app)
+    results = []
+    try:
+        for name in args.scenarios:
+            users = ids[:1] * args.broadcasts if name == "broadcast" else ids
+            res = await run_phase(sim, name, users, 1 if name == "broadcast" else args.concurrency)
+            results.append(res)
+            print_row(res)
+    finally:
+        bot.QUERY_HOOKS.remove(sim.on_query)
+        await bot.post_stop(app)
+        await app.shutdown()
+        await bot.post_shutdown(app)
+    return results
+
+COLS = ("scenario", "runs", "updates_per_s", "update_p50_ms", "update_p99_ms", "run_p50_ms", "run_p99_ms", "db_ops_per_run", "api_calls_per_run", "retry_after")
+
+def print_row(res: dict) -> None:
+    print("  ".join(f"{k}={res[k]}" for k in COLS) + (f"  errors={res['errors']}" if res["errors"] else ""), flush=True)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline load test for the shop bot (fake Bot API).")
+    ap.add_argument("--users", type=int, default=500, help="synthetic users per scenario")
+    ap.add_argument("--concurrency", type=int, default=100, help="scenario runs in flight")
+    ap.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated: " + ",".join(SCENARIOS))
+    ap.add_argument("--broadcasts", type=int, default=1, help="admin broadcasts to run")
+    ap.add_argument("--api-latency-ms", type=float, default=20.0, help="mean simulated Bot API latency")
+    ap.add_argument("--retry-after-rate", type=float, default=0.0, help="share of Bot API calls answered 429")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        ap.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    # handler failures are counted, not logged one by one
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    logging.getLogger("shopbot").setLevel(logging.CRITICAL)
+    logging.getLogger("telegram").setLevel(logging.CRITICAL)
+
+    print(f"db={bot.DB_BACKEND}:{bot.DATABASE_URL if bot.IS_PG else bot.DB_PATH} users={args.users} concurrency={args.concurrency}", flush=True)
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"users": args.users, "concurrency": args.concurrency, "api_latency_ms": args.api_latency_ms,
+                       "retry_after_rate": args.retry_after_rate, "scenarios": results}, f, indent=2)
+    failed = any(k != "RetryAfter" for r in results for k in r["errors"])
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()